@@ -4,17 +4,182 @@ import json
 import shutil
 import tempfile
 import time
+import atexit
+import queue
+import random
+import contextvars
+import math
+import re
 from typing import Dict, List, Optional
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import logging
+import logging.handlers
+
+# Logging settings
+# LOG_MODE=plain keeps the classic synchronous stream handler.
+# LOG_MODE=structured writes JSON lines from a background QueueListener thread.
+LOG_MODES = ("plain", "structured")
+PLAIN_LOG_FORMAT = "%(levelname)s:%(name)s:[%(request_id)s] %(message)s"
+
+# Client-supplied X-Request-ID values must match this, otherwise one is generated
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,128}")
+
+# Per-request context, set by RequestContextMiddleware
+request_id_var = contextvars.ContextVar("request_id", default="-")
+debug_sampled_var = contextvars.ContextVar("debug_sampled", default=False)
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request id to log records."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Render log records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records untouched so message formatting happens on the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+def read_log_settings(environ):
+    """
+    Read LOG_MODE, LOG_LEVEL and LOG_DEBUG_SAMPLE_RATE from the environment.
+
+    Invalid values fall back to their defaults and out-of-range sample rates
+    are clamped to 0.0 - 1.0. Returns (mode, level, sample_rate, problems),
+    where problems lists a message for every setting that was corrected.
+    """
+    problems = []
+
+    mode = environ.get("LOG_MODE", "plain").lower()
+    if mode not in LOG_MODES:
+        problems.append(f"Unknown LOG_MODE {mode!r}, using 'plain' (expected one of {', '.join(LOG_MODES)})")
+        mode = "plain"
+
+    level_name = environ.get("LOG_LEVEL", "INFO").upper()
+    level = logging.getLevelName(level_name)
+    if not isinstance(level, int):
+        problems.append(f"Unknown LOG_LEVEL {level_name!r}, using 'INFO'")
+        level = logging.INFO
+
+    # Fraction of requests (0.0 - 1.0) whose per-request debug lines are emitted
+    # when LOG_LEVEL is above DEBUG. With LOG_LEVEL=DEBUG every request is logged.
+    raw_rate = environ.get("LOG_DEBUG_SAMPLE_RATE", "0")
+    try:
+        sample_rate = float(raw_rate)
+    except ValueError:
+        sample_rate = math.nan
+    if math.isnan(sample_rate):
+        problems.append(f"Invalid LOG_DEBUG_SAMPLE_RATE {raw_rate!r}, using 0")
+        sample_rate = 0.0
+    elif not 0.0 <= sample_rate <= 1.0:
+        clamped = min(max(sample_rate, 0.0), 1.0)
+        problems.append(f"LOG_DEBUG_SAMPLE_RATE {raw_rate!r} is outside 0.0 - 1.0, using {clamped}")
+        sample_rate = clamped
+
+    return mode, level, sample_rate, problems
+
+def configure_logging(mode, level, problems=()):
+    """Configure the root logger for the given LOG_MODE and report setting problems."""
+    context_filter = RequestContextFilter()
+
+    if mode != "structured":
+        logging.basicConfig(level=level, format=PLAIN_LOG_FORMAT)
+        for handler in logging.getLogger().handlers:
+            handler.addFilter(context_filter)
+        listener = None
+    else:
+        listener = _start_structured_logging(level, context_filter)
+
+    for problem in problems:
+        logging.getLogger(__name__).warning(problem)
+    return listener
+
+def _start_structured_logging(level, context_filter):
+    """Route the root logger through a queue to a JSON-writing listener thread."""
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = LazyQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(context_filter)
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+LOG_MODE, LOG_LEVEL, LOG_DEBUG_SAMPLE_RATE, log_setting_problems = read_log_settings(os.environ)
+log_listener = configure_logging(LOG_MODE, LOG_LEVEL, log_setting_problems)
 logger = logging.getLogger(__name__)
 
+# Per-request debug lines go through their own logger, so sampling never
+# lowers the level of the root or third-party loggers
+request_debug_logger = logging.getLogger(f"{__name__}.request")
+if LOG_DEBUG_SAMPLE_RATE > 0:
+    request_debug_logger.setLevel(logging.DEBUG)
+
+def log_request_debug(msg, *args):
+    """Log a per-request debug line if the current request is sampled."""
+    if debug_sampled_var.get():
+        request_debug_logger.debug(msg, *args)
+
+class RequestContextMiddleware:
+    """ASGI middleware that assigns a request id and decides debug sampling."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not REQUEST_ID_PATTERN.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        sampled = LOG_LEVEL <= logging.DEBUG or random.random() < LOG_DEBUG_SAMPLE_RATE
+        id_token = request_id_var.set(request_id)
+        sampled_token = debug_sampled_var.set(sampled)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(id_token)
+            debug_sampled_var.reset(sampled_token)
+
 # Initialize FastAPI app
 app = FastAPI(title="ImageCombiner API", version="1.0.0")
 
@@ -27,6 +192,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request id / debug sampling middleware
+app.add_middleware(RequestContextMiddleware)
+
 # In-memory storage (replacing MongoDB for simplicity)
 downloads_db = {}
 
@@ -50,110 +218,391 @@ Author: ImageCombiner Team
 License: MIT
 """
 from PIL import Image
+import io
 import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
-def combine_images_16_9(input_folder=r"images/", output_image="combined_16_9.jpg", 
-                       final_width=1920, final_height=1080, quality=85):
+# Supported input image formats
+SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')
+
+# Output types accepted by combine_images()
+OUTPUT_TYPES = ('image', 'array', 'bytes')
+
+# Encoding formats accepted when output_type is 'bytes', plus common aliases
+OUTPUT_FORMATS = ('JPEG', 'PNG', 'BMP', 'TIFF', 'WEBP')
+FORMAT_ALIASES = {'JPG': 'JPEG', 'TIF': 'TIFF'}
+
+# Perceptual hash methods accepted by dedup_images()
+HASH_METHODS = ('dhash', 'ahash')
+
+def _source_name(source, index):
+    """Return a readable name for an image source (used in messages)."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    return getattr(source, 'name', None) or f"image #{index + 1}"
+
+@contextmanager
+def _open_image(source):
+    """Open a PIL image, raw bytes, file-like object or path as a PIL image."""
+    if isinstance(source, Image.Image):
+        # Caller owns the image, do not close it
+        yield source
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        yield img
+
+def _to_rgb(img):
+    """Convert an image to RGB, flattening transparency onto white."""
+    if img.mode == 'RGB':
+        return img
+    if img.mode == 'RGBA':
+        # Create white background for transparent images
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    return img.convert('RGB')
+
+def _encode_output(img, output_type, image_format, quality):
+    """Return the combined image in the requested output type."""
+    if output_type == 'image':
+        return img
+    if output_type == 'array':
+        import numpy as np
+        return np.asarray(img)
+    buffer = io.BytesIO()
+    img.save(buffer, image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def _image_hash(img, hash_method='dhash', hash_size=8, reduce_decode=False):
     """
-    Combine multiple images into a single 16:9 aspect ratio image.
+    Compute a 64-bit perceptual hash (dHash or aHash) of an image.
+    
+    With reduce_decode, JPEGs are decoded at a reduced scale in grayscale,
+    which is much cheaper than a full decode.
+    """
+    width = hash_size + 1 if hash_method == 'dhash' else hash_size
+    if reduce_decode:
+        img.draft('L', (width * 8, hash_size * 8))
+    small = img.convert('L').resize((width, hash_size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    
+    bits = 0
+    if hash_method == 'dhash':
+        # Compare each pixel to its right-hand neighbour
+        for row in range(hash_size):
+            for col in range(hash_size):
+                left = pixels[row * width + col]
+                bits = (bits << 1) | (left > pixels[row * width + col + 1])
+    else:
+        # Compare each pixel to the mean brightness
+        average = sum(pixels) / len(pixels)
+        for value in pixels:
+            bits = (bits << 1) | (value > average)
+    return bits
+
+def _hamming_distance(a, b):
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')
+
+class BKTree:
+    """BK-tree of perceptual hashes for Hamming-distance lookups."""
+    
+    def __init__(self):
+        self.root = None
+    
+    def add(self, value):
+        """Insert a hash into the tree."""
+        if self.root is None:
+            self.root = (value, {})
+            return
+        node_value, children = self.root
+        while True:
+            distance = _hamming_distance(value, node_value)
+            if distance == 0:
+                return
+            if distance not in children:
+                children[distance] = (value, {})
+                return
+            node_value, children = children[distance]
+    
+    def find(self, value, threshold):
+        """Return a stored hash within `threshold` bits of `value`, or None."""
+        if self.root is None:
+            return None
+        candidates = [self.root]
+        while candidates:
+            node_value, children = candidates.pop()
+            distance = _hamming_distance(value, node_value)
+            if distance <= threshold:
+                return node_value
+            # Triangle inequality: only these subtrees can hold a match
+            for child_distance, child in children.items():
+                if distance - threshold <= child_distance <= distance + threshold:
+                    candidates.append(child)
+        return None
+
+def dedup_images(images, threshold=5, hash_method='dhash', verbose=False):
+    """
+    Drop near-identical images before compositing.
+    
+    Each source is hashed from a reduced decode and compared against the
+    hashes of all frames kept so far. Sources that cannot be hashed are kept,
+    so compositing reports them as usual. File-like sources are restored to
+    their starting position; non-seekable streams are buffered in memory.
+    
+    Both hashes work on brightness only and ignore colour, so frames that
+    differ only in hue (e.g. plain-colour title cards or fades) count as
+    duplicates of each other.
     
     Args:
-        input_folder: Path to folder containing images
-        output_image: Output filename
+        images: Iterable of PIL images, bytes, file-like objects or paths
+        threshold: Maximum Hamming distance (of 64 bits) for a near-duplicate
+        hash_method: 'dhash' (gradient) or 'ahash' (mean brightness)
+        verbose: Print skipped frames
+    
+    Returns:
+        (kept, stats) where kept is the list of kept sources and stats is a
+        dict with 'kept', 'skipped' and 'hash_seconds'.
+    """
+    if hash_method not in HASH_METHODS:
+        raise ValueError(f"hash_method must be one of {', '.join(HASH_METHODS)}")
+    
+    start = time.perf_counter()
+    tree = BKTree()
+    kept = []
+    skipped = 0
+    
+    for i, source in enumerate(images):
+        position = None
+        try:
+            if hasattr(source, 'read'):
+                seekable = getattr(source, 'seekable', None)
+                if seekable is None or not seekable():
+                    # Buffer the stream so it can be decoded a second time
+                    source = io.BytesIO(source.read())
+                position = source.tell()
+            
+            with _open_image(source) as img:
+                image_hash = _image_hash(img, hash_method,
+                                         reduce_decode=not isinstance(source, Image.Image))
+        except Exception:
+            kept.append(source)
+            continue
+        finally:
+            # Restore file-like sources so compositing decodes them again
+            if position is not None:
+                source.seek(position)
+        
+        if tree.find(image_hash, threshold) is not None:
+            skipped += 1
+            if verbose:
+                print(f"🔁 Skipping near-duplicate: {_source_name(source, i)}")
+            continue
+        
+        tree.add(image_hash)
+        kept.append(source)
+    
+    stats = {
+        'kept': len(kept),
+        'skipped': skipped,
+        'hash_seconds': time.perf_counter() - start,
+    }
+    return kept, stats
+
+def combine_images(images, final_width=1920, final_height=1080, output_type='image',
+                   image_format='JPEG', quality=85, count=None, verbose=False,
+                   dedup_threshold=None, hash_method='dhash', dedup_stats=None):
+    """
+    Combine images side by side into a single image, entirely in memory.
+    
+    Each source is decoded, resized to its strip and pasted straight into the
+    output, so only one decoded input is held at a time. If the number of
+    images is unknown (a generator without `count`), the undecoded sources
+    are collected first to size the strips.
+    
+    With dedup_threshold set, near-identical frames are dropped first (see
+    dedup_images()). This also collects the undecoded sources.
+    
+    Args:
+        images: Iterable of PIL images, bytes, file-like objects or paths
         final_width: Final image width (default 1920)
         final_height: Final image height (default 1080)
+        output_type: 'image' (PIL image), 'array' (NumPy array) or 'bytes'
+        image_format: Encoding format when output_type is 'bytes': JPEG (or
+            jpg, the default), PNG, BMP, TIFF or WEBP
         quality: JPEG quality (1-100, default 85)
-    """
+        count: Number of images, if `images` has no len(); must match the
+            number of images actually supplied
+        verbose: Print progress messages
+        dedup_threshold: Drop near-duplicates within this Hamming distance
+            (None disables deduplication)
+        hash_method: Perceptual hash used for deduplication ('dhash' or 'ahash')
+        dedup_stats: Optional dict, filled with the deduplication statistics
+            plus an estimated net 'time_saved_seconds' (skipped work minus
+            hashing time; negative when hashing cost more than it saved)
     
-    # Create input folder if it doesn't exist
-    Path(input_folder).mkdir(exist_ok=True)
+    Returns:
+        The combined image as a PIL image, NumPy array or encoded bytes.
     
-    # Get list of supported image formats
-    supported_formats = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp')
+    Raises:
+        ValueError: If there are no images, none could be processed, or the
+            number of images differs from `count`.
+    """
+    if output_type not in OUTPUT_TYPES:
+        raise ValueError(f"output_type must be one of {', '.join(OUTPUT_TYPES)}")
     
-    # Get sorted list of images
-    try:
-        all_files = os.listdir(input_folder)
-        images = sorted([img for img in all_files 
-                        if img.lower().endswith(supported_formats)])
-    except FileNotFoundError:
-        print(f"❌ Error: Folder '{input_folder}' not found!")
-        return False
+    image_format = str(image_format).upper()
+    image_format = FORMAT_ALIASES.get(image_format, image_format)
+    if image_format not in OUTPUT_FORMATS:
+        raise ValueError(f"image_format must be one of {', '.join(OUTPUT_FORMATS)}")
     
-    if not images:
-        print(f"❌ No supported images found in '{input_folder}'")
-        print(f"Supported formats: {', '.join(supported_formats)}")
-        return False
+    dedup = None
+    if dedup_threshold is not None:
+        images, dedup = dedup_images(images, dedup_threshold, hash_method, verbose)
+        consumed = dedup['kept'] + dedup['skipped']
+        if count is not None and consumed != count:
+            raise ValueError(f"Expected {count} images, got {consumed}")
+        count = len(images)
     
-    print(f"📁 Found {len(images)} images to combine")
+    if count is None:
+        try:
+            count = len(images)
+        except TypeError:
+            images = list(images)
+            count = len(images)
+    
+    if count == 0:
+        raise ValueError("No images to combine")
     
     # Calculate strip width dynamically based on number of images
-    strip_width = final_width // len(images)
+    strip_width = final_width // count
     
     # Ensure minimum width
     if strip_width < 10:
-        print(f"⚠️  Warning: Too many images ({len(images)}). Each strip will be very narrow.")
+        if verbose:
+            print(f"⚠️  Warning: Too many images ({count}). Each strip will be very narrow.")
         strip_width = 10
     
-    print(f"🔧 Each image will be resized to {strip_width}x{final_height}")
+    if verbose:
+        print(f"🔧 Each image will be resized to {strip_width}x{final_height}")
+    
+    combined_img = Image.new("RGB", (final_width, final_height), color=(255, 255, 255))
     
-    # Process images
-    processed_images = []
+    # Paste images side by side as they are processed
+    x_offset = 0
+    last_strip = None
     failed_images = []
+    process_seconds = 0.0
+    consumed = 0
     
-    for i, img_name in enumerate(images):
+    for i, source in enumerate(images):
+        if i >= count:
+            raise ValueError(f"Got more images than count={count}")
+        consumed = i + 1
+        name = _source_name(source, i)
         try:
-            img_path = os.path.join(input_folder, img_name)
-            print(f"📷 Processing {i+1}/{len(images)}: {img_name}")
+            if verbose:
+                print(f"📷 Processing {i+1}/{count}: {name}")
             
-            # Open and process image
-            with Image.open(img_path) as img:
-                # Convert to RGB if needed (handles PNG with transparency, etc.)
-                if img.mode != 'RGB':
-                    if img.mode == 'RGBA':
-                        # Create white background for transparent images
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[-1])
-                        img = background
-                    else:
-                        img = img.convert('RGB')
-                
+            start = time.perf_counter()
+            with _open_image(source) as img:
                 # Resize image to strip dimensions
                 # Use LANCZOS for high quality resizing
-                img_resized = img.resize((strip_width, final_height), Image.Resampling.LANCZOS)
-                processed_images.append(img_resized)
+                strip = _to_rgb(img).resize((strip_width, final_height), Image.Resampling.LANCZOS)
                 
         except Exception as e:
-            print(f"❌ Failed to process {img_name}: {str(e)}")
-            failed_images.append(img_name)
+            if verbose:
+                print(f"❌ Failed to process {name}: {str(e)}")
+            failed_images.append(name)
             continue
+        
+        process_seconds += time.perf_counter() - start
+        combined_img.paste(strip, (x_offset, 0))
+        x_offset += strip.width
+        last_strip = strip
     
-    if not processed_images:
-        print("❌ No images were successfully processed!")
-        return False
+    if consumed < count:
+        raise ValueError(f"Expected {count} images, got {consumed}")
     
-    if failed_images:
-        print(f"⚠️  {len(failed_images)} images failed to process: {', '.join(failed_images)}")
+    if last_strip is None:
+        raise ValueError("No images were successfully processed!")
     
-    # Create combined image
-    print(f"🎨 Creating combined image ({final_width}x{final_height})")
-    combined_img = Image.new("RGB", (final_width, final_height), color=(255, 255, 255))
+    if failed_images and verbose:
+        print(f"⚠️  {len(failed_images)} images failed to process: {', '.join(failed_images)}")
     
-    # Paste images side by side
-    x_offset = 0
-    for img in processed_images:
-        combined_img.paste(img, (x_offset, 0))
-        x_offset += img.width
+    if dedup is not None:
+        # Skipped frames would each have cost about one average decode + resize,
+        # but every frame paid for an extra (reduced) decode to be hashed
+        processed = count - len(failed_images)
+        skipped_seconds = dedup['skipped'] * process_seconds / processed
+        dedup['time_saved_seconds'] = skipped_seconds - dedup['hash_seconds']
+        if dedup_stats is not None:
+            dedup_stats.update(dedup)
+        if verbose:
+            print(f"🔁 Skipped {dedup['skipped']} near-duplicate frames "
+                  f"(~{dedup['time_saved_seconds']:.2f}s net time saved, "
+                  f"after {dedup['hash_seconds']:.2f}s spent hashing)")
     
     # Fill remaining space with the last image if needed
-    if x_offset < final_width and processed_images:
+    if x_offset < final_width:
         remaining_width = final_width - x_offset
-        if remaining_width > 0:
-            # Stretch the last image to fill remaining space
-            last_img = processed_images[-1]
-            stretched_img = last_img.resize((remaining_width, final_height), Image.Resampling.LANCZOS)
-            combined_img.paste(stretched_img, (x_offset, 0))
+        # Stretch the last image to fill remaining space
+        stretched_img = last_strip.resize((remaining_width, final_height), Image.Resampling.LANCZOS)
+        combined_img.paste(stretched_img, (x_offset, 0))
+    
+    return _encode_output(combined_img, output_type, image_format, quality)
+
+def combine_images_16_9(input_folder=r"images/", output_image="combined_16_9.jpg", 
+                       final_width=1920, final_height=1080, quality=85, dedup_threshold=None):
+    """
+    Combine multiple images into a single 16:9 aspect ratio image.
+    
+    Args:
+        input_folder: Path to folder containing images
+        output_image: Output filename
+        final_width: Final image width (default 1920)
+        final_height: Final image height (default 1080)
+        quality: JPEG quality (1-100, default 85)
+        dedup_threshold: Skip near-duplicate frames within this Hamming
+            distance (None disables deduplication)
+    """
+    
+    # Create input folder if it doesn't exist
+    Path(input_folder).mkdir(exist_ok=True)
+    
+    # Get sorted list of images
+    try:
+        all_files = os.listdir(input_folder)
+        images = sorted([img for img in all_files 
+                        if img.lower().endswith(SUPPORTED_FORMATS)])
+    except FileNotFoundError:
+        print(f"❌ Error: Folder '{input_folder}' not found!")
+        return False
+    
+    if not images:
+        print(f"❌ No supported images found in '{input_folder}'")
+        print(f"Supported formats: {', '.join(SUPPORTED_FORMATS)}")
+        return False
+    
+    print(f"📁 Found {len(images)} images to combine")
+    
+    try:
+        combined_img = combine_images(
+            [os.path.join(input_folder, img_name) for img_name in images],
+            final_width=final_width,
+            final_height=final_height,
+            verbose=True,
+            dedup_threshold=dedup_threshold
+        )
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        return False
+    
+    print(f"🎨 Creating combined image ({final_width}x{final_height})")
     
     # Save output
     try:
@@ -229,10 +678,43 @@ combine_images_16_9(
 )
 ```
 
+### Library API
+
+`combine_images` works fully in memory. It accepts any iterable of PIL images,
+bytes, file-like objects or paths and consumes it lazily.
+
+```python
+from imagecombiner import combine_images
+
+image = combine_images(pil_images)                        # PIL image
+array = combine_images(pil_images, output_type="array")   # NumPy array
+jpeg_bytes = combine_images((p.read_bytes() for p in paths),
+                            output_type="bytes", count=len(paths))
+```
+
+Pass `count` when feeding a generator so strips can be sized without
+collecting the sources first.
+
+### Near-duplicate frames
+
+Movie frames and burst shots are often nearly identical. Set `dedup_threshold`
+(Hamming distance out of 64 bits, e.g. `5`) to skip near-duplicates. Every frame
+is first decoded once for a perceptual hash (`hash_method` is `"dhash"` or
+`"ahash"`); JPEGs are decoded at reduced scale for this. Near-duplicates then
+skip the full decode and resize and do not take up a strip. `time_saved_seconds` is
+the net saving after hashing and can be negative when few frames repeat. The hashes ignore colour, so plain-colour frames
+such as title cards or fades are treated as duplicates of each other.
+
+```python
+stats = {}
+combine_images(frames, dedup_threshold=5, dedup_stats=stats)
+print(stats["skipped"], stats["time_saved_seconds"])
+```
+
 ## 📁 Input/Output
 
-**Input**: Folder with images  
-**Output**: Single JPEG panoramic image (16:9 aspect ratio)  
+**Input**: Folder with images (or images, bytes, file objects in memory)  
+**Output**: Single JPEG panoramic image (16:9 aspect ratio), or PIL image / NumPy array / bytes  
 **Formats**: JPG, PNG, BMP, TIFF, WebP → JPEG  
 
 **Example**: Process movie frames into a single panoramic image
@@ -254,7 +736,7 @@ async def create_download_package(request: DownloadRequest):
         package_dir = os.path.join(temp_dir, "ImagePack")
         os.makedirs(package_dir, exist_ok=True)
         
-        logger.info(f"Created temp directory: {temp_dir}")
+        log_request_debug("Created temp directory: %s", temp_dir)
         
         # Write files to package
         files_to_create = {
@@ -267,13 +749,13 @@ async def create_download_package(request: DownloadRequest):
             file_path = os.path.join(package_dir, filename)
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(content)
-            logger.info(f"Created file: {file_path}")
+            log_request_debug("Created file: %s", file_path)
         
         # Create zip file
         zip_name = f"ImageCombiner_{download_id}"
         zip_path = os.path.join(temp_dir, f"{zip_name}.zip")
         
-        logger.info(f"Creating zip file: {zip_path}")
+        log_request_debug("Creating zip file: %s", zip_path)
         shutil.make_archive(zip_path.replace('.zip', ''), 'zip', package_dir)
         
         # Verify zip file was created
@@ -281,7 +763,7 @@ async def create_download_package(request: DownloadRequest):
             raise Exception(f"Zip file was not created: {zip_path}")
         
         file_size = os.path.getsize(zip_path)
-        logger.info(f"Zip file created successfully, size: {file_size} bytes")
+        log_request_debug("Zip file created successfully, size: %d bytes", file_size)
         
         # Store download info in memory
         downloads_db[download_id] = {
@@ -295,7 +777,7 @@ async def create_download_package(request: DownloadRequest):
             "file_size": file_size
         }
         
-        logger.info(f"Created download package: {download_id}")
+        logger.info("Created download package: %s", download_id)
         
         return DownloadResponse(
             download_id=download_id,
@@ -303,7 +785,7 @@ async def create_download_package(request: DownloadRequest):
         )
         
     except Exception as e:
-        logger.error(f"Error creating download package: {e}")
+        logger.error("Error creating download package: %s", e)
         # Clean up temp directory if it was created
         if 'temp_dir' in locals():
             try:
@@ -316,33 +798,33 @@ async def create_download_package(request: DownloadRequest):
 async def download_package(download_id: str):
     """Download the ImageCombiner package."""
     try:
-        logger.info(f"Download requested for ID: {download_id}")
+        log_request_debug("Download requested for ID: %s", download_id)
         
         # Find download info
         if download_id not in downloads_db:
-            logger.error(f"Download ID not found: {download_id}")
+            logger.error("Download ID not found: %s", download_id)
             raise HTTPException(status_code=404, detail="Download not found")
         
         download_info = downloads_db[download_id]
         zip_path = download_info["zip_path"]
         
-        logger.info(f"Zip path: {zip_path}")
+        log_request_debug("Zip path: %s", zip_path)
         
         if not os.path.exists(zip_path):
-            logger.error(f"Zip file not found: {zip_path}")
+            logger.error("Zip file not found: %s", zip_path)
             raise HTTPException(status_code=404, detail="Download file not found")
         
         # Check file size
         file_size = os.path.getsize(zip_path)
         if file_size == 0:
-            logger.error(f"Zip file is empty: {zip_path}")
+            logger.error("Zip file is empty: %s", zip_path)
             raise HTTPException(status_code=500, detail="Download file is corrupted")
         
         # Mark as downloaded
         downloads_db[download_id]["downloaded"] = True
         downloads_db[download_id]["downloaded_at"] = time.time()
         
-        logger.info(f"Download started: {download_id}, file size: {file_size} bytes")
+        logger.info("Download started: %s, file size: %d bytes", download_id, file_size)
         
         # Return file with proper headers
         headers = {
@@ -361,7 +843,7 @@ async def download_package(download_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error downloading package: {e}")
+        logger.error("Error downloading package: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to download package: {str(e)}")
 
 @app.get("/api/download/{download_id}/status")
@@ -390,7 +872,7 @@ async def get_download_status(download_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting download status: {e}")
+        logger.error("Error getting download status: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get download status")
 
 @app.get("/api/stats")
@@ -408,7 +890,7 @@ async def get_stats():
         }
         
     except Exception as e:
-        logger.error(f"Error getting stats: {e}")
+        logger.error("Error getting stats: %s", e)
         raise HTTPException(status_code=500, detail="Failed to retrieve stats")
 
 @app.delete("/api/cleanup")
@@ -427,9 +909,9 @@ async def cleanup_old_downloads():
                     try:
                         shutil.rmtree(temp_dir)
                         cleanup_count += 1
-                        logger.info(f"Cleaned up temp directory: {temp_dir}")
+                        logger.info("Cleaned up temp directory: %s", temp_dir)
                     except Exception as e:
-                        logger.error(f"Failed to cleanup {temp_dir}: {e}")
+                        logger.error("Failed to cleanup %s: %s", temp_dir, e)
                 
                 downloads_to_remove.append(download_id)
         
@@ -443,7 +925,7 @@ async def cleanup_old_downloads():
         }
         
     except Exception as e:
-        logger.error(f"Error during cleanup: {e}")
+        logger.error("Error during cleanup: %s", e)
         raise HTTPException(status_code=500, detail="Failed to cleanup old downloads")
 
 # Health check endpoint
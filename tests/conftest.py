@@ -0,0 +1,58 @@
+import ast
+import importlib
+import io
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+MAIN_PY = BACKEND_DIR / "main.py"
+
+# Output size used by the combiner tests
+WIDTH, HEIGHT = 40, 10
+
+
+def png_bytes(img):
+    """Encode a PIL image as PNG bytes."""
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def load_combiner_module():
+    """Build the packaged imagecombiner.py module from PYTHON_CODE_TEMPLATE.
+
+    The template is read with ast so the tests do not need the API's
+    FastAPI dependencies.
+    """
+    tree = ast.parse(MAIN_PY.read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "PYTHON_CODE_TEMPLATE"
+            for target in node.targets
+        ):
+            source = ast.literal_eval(node.value)
+            break
+    else:
+        raise RuntimeError("PYTHON_CODE_TEMPLATE not found in backend/main.py")
+
+    module = types.ModuleType("imagecombiner")
+    exec(compile(source, "imagecombiner.py", "exec"), module.__dict__)
+    return module
+
+
+@pytest.fixture(scope="session")
+def combiner():
+    pytest.importorskip("PIL")
+    return load_combiner_module()
+
+
+@pytest.fixture(scope="session")
+def api():
+    """The backend API module (backend/main.py)."""
+    pytest.importorskip("fastapi")
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    return importlib.import_module("main")
@@ -0,0 +1,162 @@
+import io
+
+import pytest
+
+from tests.conftest import HEIGHT, WIDTH, png_bytes
+
+Image = pytest.importorskip("PIL.Image")
+
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0)]
+
+
+def solid(color, mode="RGB", size=(16, 16)):
+    return Image.new(mode, size, color)
+
+
+def strip_colors(img, count):
+    """Color at the centre of each of `count` equal strips."""
+    strip_width = img.width // count
+    return [img.getpixel((i * strip_width + strip_width // 2, img.height // 2))
+            for i in range(count)]
+
+
+def assert_close(actual, expected, tolerance=2):
+    assert all(abs(a - e) <= tolerance for a, e in zip(actual, expected)), (actual, expected)
+
+
+def test_output_type_image(combiner):
+    result = combiner.combine_images([solid(c) for c in COLORS], WIDTH, HEIGHT)
+    assert isinstance(result, Image.Image)
+    assert result.size == (WIDTH, HEIGHT)
+    assert result.mode == "RGB"
+
+
+def test_output_type_array(combiner):
+    np = pytest.importorskip("numpy")
+    result = combiner.combine_images([solid(c) for c in COLORS], WIDTH, HEIGHT,
+                                     output_type="array")
+    assert isinstance(result, np.ndarray)
+    assert result.shape == (HEIGHT, WIDTH, 3)
+
+
+def test_output_type_bytes(combiner):
+    jpeg = combiner.combine_images([solid(c) for c in COLORS], WIDTH, HEIGHT,
+                                   output_type="bytes")
+    assert jpeg[:2] == b"\xff\xd8"
+
+    png = combiner.combine_images([solid(c) for c in COLORS], WIDTH, HEIGHT,
+                                  output_type="bytes", image_format="PNG")
+    with Image.open(io.BytesIO(png)) as img:
+        assert img.format == "PNG"
+        assert img.size == (WIDTH, HEIGHT)
+
+
+def test_invalid_output_type(combiner):
+    with pytest.raises(ValueError):
+        combiner.combine_images([solid(COLORS[0])], output_type="gif")
+
+
+@pytest.mark.parametrize("image_format, expected", [("jpg", "JPEG"), ("png", "PNG"), ("tif", "TIFF")])
+def test_image_format_aliases(combiner, image_format, expected):
+    data = combiner.combine_images([solid(COLORS[0])], WIDTH, HEIGHT,
+                                   output_type="bytes", image_format=image_format)
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.format == expected
+
+
+def test_invalid_image_format(combiner):
+    with pytest.raises(ValueError, match="image_format"):
+        combiner.combine_images([solid(COLORS[0])], output_type="bytes", image_format="xyz")
+
+
+def test_mixed_input_types(combiner, tmp_path):
+    path = tmp_path / "yellow.png"
+    solid(COLORS[3]).save(path)
+    sources = [
+        png_bytes(solid(COLORS[0])),
+        io.BytesIO(png_bytes(solid(COLORS[1]))),
+        solid(COLORS[2]),
+        str(path),
+    ]
+    result = combiner.combine_images(sources, WIDTH, HEIGHT)
+    for actual, expected in zip(strip_colors(result, 4), COLORS):
+        assert_close(actual, expected)
+
+
+def test_generator_without_count(combiner):
+    result = combiner.combine_images((solid(c) for c in COLORS), WIDTH, HEIGHT)
+    for actual, expected in zip(strip_colors(result, 4), COLORS):
+        assert_close(actual, expected)
+
+
+class TrackedStream(io.BytesIO):
+    """BytesIO that records whether it has been read (decoded) yet."""
+
+    was_read = False
+
+    def read(self, *args):
+        self.was_read = True
+        return super().read(*args)
+
+
+def test_generator_with_count_is_consumed_lazily(combiner):
+    previous_read_before_next_yield = []
+
+    def frames():
+        previous = None
+        for color in COLORS:
+            if previous is not None:
+                previous_read_before_next_yield.append(previous.was_read)
+            previous = TrackedStream(png_bytes(solid(color)))
+            yield previous
+
+    result = combiner.combine_images(frames(), WIDTH, HEIGHT, count=len(COLORS))
+    # Each frame was decoded before the generator was asked for the next one
+    assert previous_read_before_next_yield == [True] * (len(COLORS) - 1)
+    for actual, expected in zip(strip_colors(result, 4), COLORS):
+        assert_close(actual, expected)
+
+
+@pytest.mark.parametrize("count", [2, 6])
+def test_count_mismatch_raises(combiner, count):
+    with pytest.raises(ValueError):
+        combiner.combine_images((solid(c) for c in COLORS), WIDTH, HEIGHT, count=count)
+
+
+def test_empty_input_raises(combiner):
+    with pytest.raises(ValueError, match="No images to combine"):
+        combiner.combine_images([])
+
+
+def test_all_failed_raises(combiner):
+    with pytest.raises(ValueError, match="No images were successfully processed"):
+        combiner.combine_images([b"not an image", io.BytesIO(b"garbage")])
+
+
+def test_failed_images_are_skipped(combiner):
+    result = combiner.combine_images([solid(COLORS[0]), b"not an image"], WIDTH, HEIGHT)
+    # The failed strip is filled by stretching the last good one
+    assert_close(result.getpixel((WIDTH - 1, HEIGHT // 2)), COLORS[0])
+
+
+def test_rgba_is_flattened_onto_white(combiner):
+    transparent = solid((255, 0, 0, 0), mode="RGBA")
+    result = combiner.combine_images([transparent], WIDTH, HEIGHT)
+    assert result.getpixel((WIDTH // 2, HEIGHT // 2)) == (255, 255, 255)
+
+
+def test_folder_wrapper(combiner, tmp_path, capsys):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i, color in enumerate(COLORS):
+        solid(color).save(folder / f"{i}.png")
+    output = tmp_path / "combined.jpg"
+
+    assert combiner.combine_images_16_9(str(folder), str(output), WIDTH, HEIGHT)
+    with Image.open(output) as img:
+        assert img.size == (WIDTH, HEIGHT)
+    assert "🎨 Creating combined image" in capsys.readouterr().out
+
+
+def test_folder_wrapper_without_images(combiner, tmp_path):
+    assert combiner.combine_images_16_9(str(tmp_path), str(tmp_path / "out.jpg")) is False
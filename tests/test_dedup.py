@@ -0,0 +1,187 @@
+import io
+
+import pytest
+
+from tests.conftest import HEIGHT, WIDTH, png_bytes
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def gradient(reverse=False, size=(90, 80)):
+    """Grayscale image getting brighter left to right (or right to left)."""
+    width, height = size
+    img = Image.new("L", size)
+    for x in range(width):
+        value = x * 255 // (width - 1)
+        if reverse:
+            value = 255 - value
+        for y in range(height):
+            img.putpixel((x, y), value)
+    return img.convert("RGB")
+
+
+class NonSeekableStream(io.RawIOBase):
+    """Readable stream that cannot seek, like a socket or pipe."""
+
+    def __init__(self, data):
+        self._buffer = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, b):
+        data = self._buffer.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def test_bktree_find_within_and_outside_threshold(combiner):
+    tree = combiner.BKTree()
+    for value in (0b0000, 0b1111_0000, 0xFFFF):
+        tree.add(value)
+
+    assert tree.find(0b0001, 0) is None
+    assert tree.find(0b0001, 1) == 0b0000
+    assert tree.find(0b1111_0011, 2) == 0b1111_0000
+    assert tree.find(0b1111_0011, 1) is None
+    assert tree.find(0xFFFF, 0) == 0xFFFF
+    assert combiner.BKTree().find(0, 64) is None
+
+
+def test_bktree_matches_brute_force(combiner):
+    import random
+    rng = random.Random(1234)
+    values = [rng.getrandbits(64) for _ in range(200)]
+    tree = combiner.BKTree()
+    for value in values:
+        tree.add(value)
+
+    for _ in range(200):
+        query = rng.choice(values) ^ (1 << rng.randrange(64))
+        for threshold in (0, 1, 4, 24):
+            expected = any(combiner._hamming_distance(query, v) <= threshold for v in values)
+            found = tree.find(query, threshold)
+            assert (found is not None) == expected
+            if found is not None:
+                assert combiner._hamming_distance(query, found) <= threshold
+
+
+def test_dhash_on_gradient(combiner):
+    # Every pixel is darker than its right-hand neighbour -> all bits clear
+    assert combiner._image_hash(gradient(), 'dhash') == 0
+    assert combiner._image_hash(gradient(reverse=True), 'dhash') == (1 << 64) - 1
+
+
+def test_ahash_on_gradient(combiner):
+    # The right half of each row is brighter than the mean
+    assert combiner._image_hash(gradient(), 'ahash') == 0x0F0F0F0F0F0F0F0F
+    assert combiner._image_hash(gradient(reverse=True), 'ahash') == 0xF0F0F0F0F0F0F0F0
+
+
+def test_hash_ignores_colour(combiner):
+    hashes = {combiner._image_hash(Image.new("RGB", (16, 16), color), 'dhash')
+              for color in ((255, 0, 0), (0, 255, 0), (0, 0, 255))}
+    assert len(hashes) == 1
+
+
+def test_invalid_hash_method(combiner):
+    with pytest.raises(ValueError):
+        combiner.dedup_images([gradient()], hash_method='phash')
+
+
+def test_dedup_images_skips_near_duplicates(combiner):
+    frames = [gradient(), gradient(), gradient(reverse=True), png_bytes(gradient())]
+    kept, stats = combiner.dedup_images(frames, threshold=3)
+
+    assert len(kept) == 2
+    assert kept[0] is frames[0] and kept[1] is frames[2]
+    assert stats['kept'] == 2
+    assert stats['skipped'] == 2
+    assert stats['hash_seconds'] >= 0
+
+
+def test_dedup_keeps_unhashable_sources(combiner):
+    kept, stats = combiner.dedup_images([b"not an image", gradient()], threshold=3)
+    assert len(kept) == 2
+    assert stats['skipped'] == 0
+
+
+def test_combine_reports_dedup_stats(combiner):
+    stats = {}
+    frames = [gradient(), gradient(), gradient(), gradient(reverse=True)]
+    result = combiner.combine_images(frames, WIDTH, HEIGHT, dedup_threshold=3,
+                                     dedup_stats=stats)
+
+    assert stats['skipped'] == 2
+    assert stats['kept'] == 2
+    # Net saving: the skipped work minus the hashing overhead
+    assert stats['time_saved_seconds'] + stats['hash_seconds'] >= 0
+    # Two strips: dark-to-bright followed by bright-to-dark
+    assert result.getpixel((1, 5))[0] < 50
+    assert result.getpixel((WIDTH - 2, 5))[0] < 50
+
+
+def test_time_saved_is_net_of_hashing(combiner):
+    stats = {}
+    combiner.combine_images([gradient(), gradient(reverse=True)], WIDTH, HEIGHT,
+                            dedup_threshold=3, dedup_stats=stats)
+
+    assert stats['skipped'] == 0
+    assert stats['time_saved_seconds'] == -stats['hash_seconds']
+
+
+@pytest.mark.parametrize("count", [2, 6])
+def test_count_mismatch_raises_with_dedup(combiner, count):
+    frames = (gradient(reverse=i % 2 == 1) for i in range(4))
+    with pytest.raises(ValueError, match="Expected"):
+        combiner.combine_images(frames, WIDTH, HEIGHT, count=count, dedup_threshold=3)
+
+
+def test_count_matches_with_dedup(combiner):
+    stats = {}
+    frames = (gradient() for _ in range(4))
+    combiner.combine_images(frames, WIDTH, HEIGHT, count=4, dedup_threshold=3,
+                            dedup_stats=stats)
+    assert stats['skipped'] == 3
+
+
+def test_output_unchanged_without_dedup(combiner):
+    frames = [gradient(), gradient(), gradient(reverse=True), gradient()]
+    stats = {}
+    default = combiner.combine_images(frames, WIDTH, HEIGHT)
+    disabled = combiner.combine_images(frames, WIDTH, HEIGHT, dedup_threshold=None,
+                                       dedup_stats=stats)
+
+    assert disabled.tobytes() == default.tobytes()
+    assert stats == {}
+
+
+def test_dedup_restores_stream_position(combiner):
+    stream = io.BytesIO(b"HDR" + png_bytes(gradient()))
+    stream.seek(3)
+
+    kept, _ = combiner.dedup_images([stream], threshold=3)
+    assert kept == [stream]
+    assert stream.tell() == 3
+
+
+def test_dedup_rewinds_streams_for_compositing(combiner):
+    frames = [io.BytesIO(png_bytes(gradient())), io.BytesIO(png_bytes(gradient(reverse=True)))]
+    stats = {}
+
+    combiner.combine_images(frames, WIDTH, HEIGHT, dedup_threshold=3, dedup_stats=stats)
+    assert stats['kept'] == 2
+
+
+def test_dedup_buffers_non_seekable_streams(combiner):
+    frames = [NonSeekableStream(png_bytes(gradient())),
+              NonSeekableStream(png_bytes(gradient(reverse=True)))]
+    stats = {}
+
+    result = combiner.combine_images(frames, WIDTH, HEIGHT, dedup_threshold=3,
+                                     dedup_stats=stats)
+    assert result.size == (WIDTH, HEIGHT)
+    assert stats['kept'] == 2
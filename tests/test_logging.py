@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+
+def make_record(msg="Created file: %s", args=("a.txt",), level=logging.INFO, exc_info=None):
+    return logging.LogRecord("main", level, __file__, 1, msg, args, exc_info)
+
+
+def run_request(api, headers=(), endpoint=None):
+    """Run one HTTP request through RequestContextMiddleware.
+
+    Returns (seen, response_headers, request_id_after), where seen is the
+    request id observed inside the app.
+    """
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["request_id"] = api.request_id_var.get()
+        if endpoint is not None:
+            endpoint()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    async def scenario():
+        middleware = api.RequestContextMiddleware(app)
+        scope = {"type": "http", "headers": list(headers)}
+        await middleware(scope, receive, send)
+        # Still inside the same task/context as the middleware
+        return api.request_id_var.get()
+
+    request_id_after = asyncio.run(scenario())
+    response_headers = dict(messages[0]["headers"])
+    return seen, response_headers, request_id_after
+
+
+def test_json_formatter(api):
+    record = make_record()
+    record.request_id = "abc"
+
+    entry = json.loads(api.JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "main"
+    assert entry["request_id"] == "abc"
+    assert entry["message"] == "Created file: a.txt"
+    assert "exc_info" not in entry
+
+
+def test_json_formatter_exc_info(api):
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = make_record("Failed", (), logging.ERROR, sys.exc_info())
+
+    entry = json.loads(api.JsonFormatter().format(record))
+
+    assert entry["request_id"] == "-"
+    assert "RuntimeError: boom" in entry["exc_info"]
+
+
+def test_lazy_queue_handler_does_not_format(api):
+    records = queue.SimpleQueue()
+    handler = api.LazyQueueHandler(records)
+    record = make_record()
+
+    handler.handle(record)
+
+    queued = records.get_nowait()
+    assert queued is record
+    assert queued.msg == "Created file: %s"
+    assert queued.args == ("a.txt",)
+    assert not hasattr(queued, "message")
+
+
+def test_middleware_echoes_request_id(api):
+    seen, headers, _ = run_request(api, [(b"x-request-id", b"client-id.1_A")])
+
+    assert seen["request_id"] == "client-id.1_A"
+    assert headers[b"x-request-id"] == b"client-id.1_A"
+
+
+def test_middleware_generates_request_id(api):
+    seen, headers, _ = run_request(api)
+
+    request_id = headers[b"x-request-id"].decode()
+    assert len(request_id) == 32
+    assert seen["request_id"] == request_id
+
+
+@pytest.mark.parametrize("bad_id", [b"x" * 129, b"bad id", b"id\r\nX-Evil: 1", b"<script>", b""])
+def test_middleware_rejects_unsafe_request_id(api, bad_id):
+    _, headers, _ = run_request(api, [(b"x-request-id", bad_id)])
+
+    request_id = headers[b"x-request-id"]
+    assert request_id != bad_id
+    assert len(request_id) == 32
+
+
+def test_middleware_resets_request_id(api):
+    _, _, request_id_after = run_request(api, [(b"x-request-id", b"abc")])
+    assert request_id_after == "-"
+
+
+def test_middleware_passes_through_non_http(api):
+    called = []
+
+    async def app(scope, receive, send):
+        called.append(scope["type"])
+
+    asyncio.run(api.RequestContextMiddleware(app)({"type": "lifespan"}, None, None))
+    assert called == ["lifespan"]
+
+
+def request_debug_lines(api, caplog, monkeypatch, sample_rate, level=logging.INFO):
+    monkeypatch.setattr(api, "LOG_DEBUG_SAMPLE_RATE", sample_rate)
+    monkeypatch.setattr(api, "LOG_LEVEL", level)
+    caplog.set_level(logging.DEBUG, logger=api.request_debug_logger.name)
+
+    def endpoint():
+        for i in range(3):
+            api.log_request_debug("line %d", i)
+
+    for _ in range(5):
+        run_request(api, endpoint=endpoint)
+    return [r.getMessage() for r in caplog.records if r.name == api.request_debug_logger.name]
+
+
+def test_log_request_debug_rate_zero(api, caplog, monkeypatch):
+    assert request_debug_lines(api, caplog, monkeypatch, 0.0) == []
+
+
+def test_log_request_debug_rate_one(api, caplog, monkeypatch):
+    lines = request_debug_lines(api, caplog, monkeypatch, 1.0)
+    assert lines == ["line 0", "line 1", "line 2"] * 5
+
+
+def test_log_request_debug_global_debug_level(api, caplog, monkeypatch):
+    lines = request_debug_lines(api, caplog, monkeypatch, 0.0, level=logging.DEBUG)
+    assert len(lines) == 15
+
+
+def test_log_request_debug_outside_request(api, caplog):
+    caplog.set_level(logging.DEBUG, logger=api.request_debug_logger.name)
+    api.log_request_debug("not in a request")
+    assert caplog.records == []
+
+
+def test_read_log_settings_defaults(api):
+    assert api.read_log_settings({}) == ("plain", logging.INFO, 0.0, [])
+
+
+def test_read_log_settings_valid(api):
+    environ = {"LOG_MODE": "Structured", "LOG_LEVEL": "debug", "LOG_DEBUG_SAMPLE_RATE": "0.25"}
+    assert api.read_log_settings(environ) == ("structured", logging.DEBUG, 0.25, [])
+
+
+@pytest.mark.parametrize("raw, expected", [("1.5", 1.0), ("-2", 0.0), ("lots", 0.0), ("nan", 0.0)])
+def test_read_log_settings_sample_rate(api, raw, expected):
+    _, _, sample_rate, problems = api.read_log_settings({"LOG_DEBUG_SAMPLE_RATE": raw})
+    assert sample_rate == expected
+    assert len(problems) == 1
+
+
+def test_read_log_settings_unknown_mode_and_level(api):
+    mode, level, _, problems = api.read_log_settings({"LOG_MODE": "json", "LOG_LEVEL": "loud"})
+    assert (mode, level) == ("plain", logging.INFO)
+    assert len(problems) == 2